@@ -11,6 +11,11 @@ from collections import OrderedDict
 
 import yaml
 
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+
 logger = logging.getLogger(__name__)
 
 
@@ -106,7 +111,7 @@ class ProvenanceLogger(object):
             self.table = {}
         else:
             with open(self._log_file, 'r') as file:
-                self.table = yaml.safe_load(file)
+                self.table = yaml.load(file, Loader=SafeLoader)
 
     def log(self, filename, record):
         """Record provenance.
@@ -142,8 +147,15 @@ class ProvenanceLogger(object):
         dirname = os.path.dirname(self._log_file)
         if not os.path.exists(dirname):
             os.makedirs(dirname)
-        with open(self._log_file, 'w') as file:
-            yaml.safe_dump(self.table, file)
+        # Write to a temporary file first, so a crash cannot corrupt the log
+        tmp_file = self._log_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as file:
+                yaml.dump(self.table, file, Dumper=SafeDumper)
+            os.rename(tmp_file, self._log_file)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
 
     def __enter__(self):
         """Enter context."""
@@ -172,13 +184,19 @@ def select_metadata(metadata, **attributes):
         A list of matching metadata.
 
     """
+    wildcard = [a for a in attributes if attributes[a] == '*']
+    exact = [(a, v) for a, v in attributes.items() if v != '*']
     selection = []
     for attribs in metadata:
-        if all(
-                a in attribs and (
-                    attribs[a] == attributes[a] or attributes[a] == '*')
-                for a in attributes):
-            selection.append(attribs)
+        for attribute, value in exact:
+            if attribute not in attribs or attribs[attribute] != value:
+                break
+        else:
+            for attribute in wildcard:
+                if attribute not in attribs:
+                    break
+            else:
+                selection.append(attribs)
     return selection
 
 
@@ -204,9 +222,7 @@ def group_metadata(metadata, attribute, sort=None):
     groups = {}
     for attributes in metadata:
         key = attributes.get(attribute)
-        if key not in groups:
-            groups[key] = []
-        groups[key].append(attributes)
+        groups.setdefault(key, []).append(attributes)
 
     if sort:
         groups = sorted_group_metadata(groups, sort)
@@ -350,7 +366,7 @@ def get_cfg(filename=None):
     if filename is None:
         filename = sys.argv[1]
     with open(filename) as file:
-        cfg = yaml.safe_load(file)
+        cfg = yaml.load(file, Loader=SafeLoader)
     return cfg
 
 
@@ -360,14 +376,14 @@ def _get_input_data_files(cfg):
     for filename in cfg['input_files']:
         if os.path.isdir(filename):
             metadata_files.extend(
-                glob.glob(os.path.join(filename, '*metadata.yml')))
+                sorted(glob.glob(os.path.join(filename, '*metadata.yml'))))
         elif os.path.basename(filename) == 'metadata.yml':
             metadata_files.append(filename)
 
     input_files = {}
     for filename in metadata_files:
         with open(filename) as file:
-            metadata = yaml.safe_load(file)
+            metadata = yaml.load(file, Loader=SafeLoader)
             input_files.update(metadata)
 
     return input_files
@@ -429,6 +445,9 @@ def run_diagnostic():
     if args.log_level:
         cfg['log_level'] = args.log_level
 
+    # Thread and multiprocessing information is not used in the log format
+    logging.logThreads = False
+    logging.logMultiprocessing = False
     logging.basicConfig(format="%(asctime)s [%(process)d] %(levelname)-8s "
                         "%(name)s,%(lineno)s\t%(message)s")
     logging.Formatter.converter = time.gmtime
@@ -438,8 +457,10 @@ def run_diagnostic():
     # Read input metadata
     cfg['input_data'] = _get_input_data_files(cfg)
 
-    logger.info("Starting diagnostic script %s with configuration:\n%s",
-                cfg['script'], yaml.safe_dump(cfg))
+    logger.info("Starting diagnostic script %s", cfg['script'])
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Configuration of diagnostic script %s:\n%s",
+                     cfg['script'], yaml.dump(cfg, Dumper=SafeDumper))
 
     # Create output directories
     output_directories = []
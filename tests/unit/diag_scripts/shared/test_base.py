@@ -0,0 +1,160 @@
+"""Tests for the shared diagnostic script functions."""
+import os
+
+import pytest
+import yaml
+
+from esmvaltool.diag_scripts.shared import _base
+
+
+def write_metadata(path, metadata):
+    """Write a metadata file."""
+    with open(str(path), 'w') as file:
+        yaml.safe_dump(metadata, file)
+
+
+METADATA = [
+    {'short_name': 'tas', 'dataset': 'A', 'exp': None},
+    {'short_name': 'pr', 'dataset': 'B'},
+    {'short_name': 'tas', 'dataset': 'C', 'exp': 'historical'},
+    {'dataset': 'D'},
+]
+
+
+def test_select_metadata():
+    """Test selecting metadata by exact value."""
+    selection = _base.select_metadata(METADATA, short_name='tas')
+    assert selection == [METADATA[0], METADATA[2]]
+
+    selection = _base.select_metadata(
+        METADATA, short_name='tas', exp='historical')
+    assert selection == [METADATA[2]]
+
+
+def test_select_metadata_wildcard():
+    """Test that the wildcard only selects metadata with the attribute."""
+    selection = _base.select_metadata(METADATA, exp='*')
+    assert selection == [METADATA[0], METADATA[2]]
+
+    selection = _base.select_metadata(METADATA, short_name='pr', exp='*')
+    assert selection == []
+
+
+def test_select_metadata_none():
+    """Test that None only matches metadata with the attribute set to None."""
+    selection = _base.select_metadata(METADATA, exp=None)
+    assert selection == [METADATA[0]]
+
+
+def test_group_metadata():
+    """Test that groups keep the order of the input metadata."""
+    groups = _base.group_metadata(METADATA, 'short_name')
+    assert groups == {
+        'tas': [METADATA[0], METADATA[2]],
+        'pr': [METADATA[1]],
+        None: [METADATA[3]],
+    }
+
+
+def test_group_metadata_sorted():
+    """Test grouping with sorted groups."""
+    groups = _base.group_metadata(METADATA, 'short_name', sort='dataset')
+    assert list(groups) == [None, 'pr', 'tas']
+    assert groups['tas'] == [METADATA[0], METADATA[2]]
+
+
+def test_get_input_data_files_from_dir(tmp_path):
+    """Test which files in an input directory are read as metadata."""
+    preproc_dir = tmp_path / 'preproc'
+    preproc_dir.mkdir()
+    write_metadata(preproc_dir / 'metadata.yml', {'a.nc': {'key': 'a'}})
+    write_metadata(preproc_dir / 'b_metadata.yml', {'b.nc': {'key': 'b'}})
+    write_metadata(preproc_dir / '.hidden_metadata.yml', {'hidden.nc': {}})
+    write_metadata(preproc_dir / 'other.yml', {'other.nc': {}})
+
+    other_dir = tmp_path / 'other'
+    other_dir.mkdir()
+    write_metadata(other_dir / 'metadata.yml', {'link.nc': {'key': 'link'}})
+    os.symlink(str(other_dir / 'metadata.yml'),
+               str(preproc_dir / 'link_metadata.yml'))
+
+    cfg = {'input_files': [str(preproc_dir)]}
+    input_files = _base._get_input_data_files(cfg)
+
+    assert input_files == {
+        'a.nc': {'key': 'a'},
+        'b.nc': {'key': 'b'},
+        'link.nc': {'key': 'link'},
+    }
+
+
+def test_get_input_data_files_sorted(tmp_path):
+    """Test that metadata files in a directory are read in sorted order."""
+    for name in ('c', 'a', 'b'):
+        write_metadata(tmp_path / (name + '_metadata.yml'),
+                       {'x.nc': {'key': name}})
+
+    cfg = {'input_files': [str(tmp_path)]}
+    input_files = _base._get_input_data_files(cfg)
+
+    assert input_files == {'x.nc': {'key': 'c'}}
+
+
+def test_get_input_data_files_merge_order(tmp_path):
+    """Test that later metadata files override earlier ones."""
+    filenames = []
+    for name in ('first', 'second', 'third'):
+        dirname = tmp_path / name
+        dirname.mkdir()
+        filename = dirname / 'metadata.yml'
+        write_metadata(filename, {
+            'shared.nc': {'key': name},
+            name + '.nc': {'key': name},
+        })
+        filenames.append(str(filename))
+
+    cfg = {'input_files': filenames}
+    input_files = _base._get_input_data_files(cfg)
+
+    assert input_files == {
+        'shared.nc': {'key': 'third'},
+        'first.nc': {'key': 'first'},
+        'second.nc': {'key': 'second'},
+        'third.nc': {'key': 'third'},
+    }
+
+
+def test_provenance_logger_save(tmp_path):
+    """Test that the provenance log round-trips and leaves no temp file."""
+    cfg = {'run_dir': str(tmp_path)}
+    record = {
+        'caption': "A plot.",
+        'ancestors': ['/path/to/input.nc'],
+    }
+    with _base.ProvenanceLogger(cfg) as provenance_logger:
+        provenance_logger.log('/path/to/output.nc', record)
+    with _base.ProvenanceLogger(cfg) as provenance_logger:
+        provenance_logger.log('/path/to/other.nc', record)
+
+    assert os.listdir(str(tmp_path)) == ['diagnostic_provenance.yml']
+    assert _base.ProvenanceLogger(cfg).table == {
+        '/path/to/output.nc': record,
+        '/path/to/other.nc': record,
+    }
+
+
+def test_provenance_logger_save_fails(tmp_path):
+    """Test that a failed save keeps the old log and leaves no temp file."""
+    cfg = {'run_dir': str(tmp_path)}
+    with _base.ProvenanceLogger(cfg) as provenance_logger:
+        provenance_logger.log('/path/to/output.nc', {'caption': "A plot."})
+
+    provenance_logger = _base.ProvenanceLogger(cfg)
+    provenance_logger.log('/path/to/other.nc', {'caption': object()})
+    with pytest.raises(yaml.YAMLError):
+        provenance_logger._save()
+
+    assert os.listdir(str(tmp_path)) == ['diagnostic_provenance.yml']
+    assert _base.ProvenanceLogger(cfg).table == {
+        '/path/to/output.nc': {'caption': "A plot."},
+    }